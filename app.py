@@ -1,11 +1,32 @@
+import hashlib
 import os
 import re
+import sqlite3
+import tempfile
 from datetime import datetime
 
-from flask import Flask, render_template, redirect, url_for, request, flash, abort
-from werkzeug.utils import secure_filename
+import bcrypt
+from flask import (
+    Flask,
+    render_template,
+    redirect,
+    url_for,
+    request,
+    flash,
+    abort,
+    session,
+)
+from flask_caching import Cache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import (
+    joinedload,
+    raiseload,
+    selectinload,
+    undefer,
+)
 
-from flask_bcrypt import Bcrypt
 from flask_login import (
     LoginManager,
     login_user,
@@ -26,52 +47,258 @@ app.config.from_object(Config)
 UPLOAD_FOLDER = os.path.join(app.root_path, "static", "images", "pets")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
+# In-progress uploads are staged outside static/ so they are never served;
+# it sits on the same filesystem so moving a finished file in is atomic
+UPLOAD_TMP_FOLDER = os.path.join(app.instance_path, "uploads")
+os.makedirs(UPLOAD_TMP_FOLDER, exist_ok=True)
+
+ALLOWED_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "gif"})
+
+# Leading "magic" bytes of each accepted image format
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+# Uploads are streamed to disk in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1 << 20
 
 
 def allowed_file(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower() in ALLOWED_EXTENSIONS
+
+
+def sniff_image_type(head: bytes):
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def save_image(stream):
+    """Store an uploaded image under the hash of its contents.
+
+    The file type is taken from the leading bytes rather than the client's
+    filename or Content-Type; anything that is not a PNG, JPEG or GIF is
+    rejected before touching the disk and None is returned.
+
+    The stream is hashed while being copied to a temp file in
+    UPLOAD_TMP_FOLDER; identical uploads map to the same name, so a duplicate
+    is just discarded instead of being written over the existing file.
+    Returns the filename.
+    """
+    first = stream.read(UPLOAD_CHUNK_SIZE)
+    ext = sniff_image_type(first)
+    if ext is None:
+        return None
+
+    hasher = hashlib.blake2b(digest_size=16)
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_TMP_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            chunk = first
+            while chunk:
+                hasher.update(chunk)
+                tmp.write(chunk)
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+
+        filename = f"{hasher.hexdigest()}.{ext}"
+        image_path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(image_path):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, image_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return filename
+
+
+# ------------- Password policy -------------
+
+# Must contain:
+#   - at least 8 characters
+#   - at least one lowercase letter
+#   - at least one uppercase letter
+#   - at least one digit
+#   - at least one special character
+PASSWORD_RE = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[\W_]).{8,}$")
 
 
 # ------------- DB / login setup -------------
 
 db.init_app(app)
-bcrypt = Bcrypt(app)
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # SQLite ignores FOREIGN KEY constraints unless asked to enforce them
+    cursor.execute("PRAGMA foreign_keys=ON")
+    # WAL lets readers run during a write and avoids an fsync per commit
+    # of the rollback journal; the rest keeps temp data and reads in memory
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
 
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 login_manager.login_message_category = "info"
 
+app.config.setdefault("CACHE_DIR", os.path.join(app.instance_path, "cache"))
+cache = Cache(app)
+
+
+def listing_cache_key():
+    # Pages embed the user's name in the nav bar, so cache them per user
+    return f"view/{current_user.get_id()}{request.full_path}"
+
+
+def has_pending_flashes():
+    # A cached page would swallow the message, so render those fresh
+    return bool(session.get("_flashes"))
+
+
+def cache_listing(view):
+    return cache.cached(
+        key_prefix=listing_cache_key,
+        unless=has_pending_flashes,
+        response_filter=lambda rv: isinstance(rv, str),  # skip redirects
+    )(view)
+
+
+def invalidate_listings():
+    # Writes are rare compared to page views; dropping every cached listing
+    # is simpler than tracking which user's pages show the changed rows
+    cache.clear()
+
+
+def paginate(query, param="page"):
+    # Page number comes from ?<param>=N; out-of-range pages render empty
+    page = request.args.get(param, 1, type=int)
+    return query.paginate(
+        page=page, per_page=app.config["ITEMS_PER_PAGE"], error_out=False
+    )
+
+
+def pet_owner_id(pet_id):
+    # Fetch just the FK needed for ownership checks; None if there's no such pet
+    return db.session.query(Pet.owner_id).filter_by(id=pet_id).scalar()
+
+
+def require_own_pet(pet_id):
+    # 404 if the pet doesn't exist, 403 if it belongs to someone else
+    owner_id = pet_owner_id(pet_id)
+    if owner_id is None:
+        abort(404)
+    if owner_id != current_user.id:
+        abort(403)
+
+
+def commit_or_404():
+    # Inserts referencing a missing pet/user fail the foreign key constraint,
+    # which saves checking for the row with a SELECT beforehand
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        abort(404)
+
+
+def hash_password(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=app.config["BCRYPT_LOG_ROUNDS"])
+    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+
+
+def check_password(pw_hash: str, password: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+
+
+def strict_loading():
+    # In debug mode, make any relationship a listing touches without
+    # eager-loading it raise instead of silently issuing one SELECT per row
+    return [raiseload("*")] if app.debug else []
+
+
+def password_needs_rehash(pw_hash: str) -> bool:
+    # bcrypt hashes look like "$2b$<rounds>$<salt+digest>"
+    return int(pw_hash.split("$")[2]) != app.config["BCRYPT_LOG_ROUNDS"]
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # The dashboard and booking form always list the user's pets
+    return db.session.get(User, int(user_id), options=[selectinload(User.pets)])
+
+
+DEFAULT_USERS = [
+    # (name, email, password, role)
+    ("Super Admin", "admin@janvar.com", "admin123", "admin"),
+    ("Dr. Meow Bark", "vet@example.com", "vet123", "vet"),
+]
 
 
 def create_admin_and_vet():
-    # Create default admin user
-    if not User.query.filter_by(email="admin@janvar.com").first():
-        admin_hash = bcrypt.generate_password_hash("admin123").decode("utf-8")
-        admin = User(
-            name="Super Admin",
-            email="admin@janvar.com",
-            password_hash=admin_hash,
-            role="admin",
-        )
-        db.session.add(admin)
-
-    # Create default vet user
-    if not User.query.filter_by(email="vet@example.com").first():
-        vet_hash = bcrypt.generate_password_hash("vet123").decode("utf-8")
-        vet = User(
-            name="Dr. Meow Bark",
-            email="vet@example.com",
-            password_hash=vet_hash,
-            role="vet",
+    # Look up all default accounts in one query and only create missing ones
+    emails = [email for _, email, _, _ in DEFAULT_USERS]
+    existing = {
+        email
+        for (email,) in db.session.query(User.email).filter(User.email.in_(emails))
+    }
+
+    missing = [
+        User(
+            name=name,
+            email=email,
+            password_hash=hash_password(password),
+            role=role,
         )
-        db.session.add(vet)
+        for name, email, password, role in DEFAULT_USERS
+        if email not in existing
+    ]
+
+    if missing:
+        db.session.add_all(missing)
+        db.session.commit()
+
+
+# ------------- HTTP caching -------------
+
+# GET pages that get an ETag, so an unchanged re-render comes back as a 304
+CONDITIONAL_ENDPOINTS = frozenset({"dashboard", "pets", "appointments"})
 
-    db.session.commit()
+
+@app.after_request
+def add_conditional_headers(response):
+    if (
+        request.method == "GET"
+        and request.endpoint in CONDITIONAL_ENDPOINTS
+        and response.status_code == 200
+    ):
+        # Always revalidate: with a max-age the browser could show a stale
+        # page right after a POST redirected back here
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def create_missing_indexes():
+    # create_all() skips tables that already exist, and their indexes with
+    # them; add any index an existing database is missing without touching data
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
 
 
 # ------------- Routes -------------
@@ -93,20 +320,12 @@ def register():
         city = request.form.get("city")  # if you added city in your register form
 
         # Check if email already exists
-        if User.query.filter_by(email=email).first():
+        if db.session.query(User.id).filter_by(email=email).first() is not None:
             flash("Email already registered", "danger")
             return redirect(url_for("register"))
 
         # --------- STRONG PASSWORD VALIDATION HERE ----------
-        # Must contain:
-        #   - at least 8 characters
-        #   - at least one lowercase letter
-        #   - at least one uppercase letter
-        #   - at least one digit
-        #   - at least one special character
-        password_pattern = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[\W_]).{8,}$"
-
-        if not re.match(password_pattern, password):
+        if not PASSWORD_RE.match(password):
             flash(
                 "Password must be at least 8 characters and include "
                 "uppercase, lowercase, number, and special character.",
@@ -115,7 +334,7 @@ def register():
             return redirect(url_for("register"))
         # ----------------------------------------------------
 
-        pw_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        pw_hash = hash_password(password)
 
         user = User(
             name=name,
@@ -126,6 +345,7 @@ def register():
         )
         db.session.add(user)
         db.session.commit()
+        invalidate_listings()
 
         flash("Registration successful. Please login.", "success")
         return redirect(url_for("login"))
@@ -140,7 +360,12 @@ def login():
         password = request.form["password"]
 
         user = User.query.filter_by(email=email).first()
-        if user and bcrypt.check_password_hash(user.password_hash, password):
+        if user and check_password(user.password_hash, password):
+            # Lazily migrate hashes created with a different cost factor
+            if password_needs_rehash(user.password_hash):
+                user.password_hash = hash_password(password)
+                db.session.commit()
+
             login_user(user)
             flash("Logged in successfully", "success")
             return redirect(url_for("dashboard"))
@@ -161,7 +386,7 @@ def logout():
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    pets = Pet.query.filter_by(owner_id=current_user.id).all()
+    pets = current_user.pets
     upcoming_appointments = VetAppointment.query.filter_by(
         owner_id=current_user.id
     ).all()
@@ -181,10 +406,16 @@ def dashboard():
 
 @app.route("/pets")
 @login_required
+@cache_listing
 def pets():
-    # simple version: show all pets
-    all_pets = Pet.query.all()
-    return render_template("pets.html", all_pets=all_pets)
+    pets_page = paginate(
+        Pet.query.options(joinedload(Pet.owner), *strict_loading()).order_by(
+            Pet.id.desc()
+        )
+    )
+    return render_template(
+        "pets.html", all_pets=pets_page.items, pagination=pets_page
+    )
 
 
 @app.route("/pets/add", methods=["POST"])
@@ -205,10 +436,12 @@ def add_pet():
     image_filename = None
 
     if image_file and image_file.filename and allowed_file(image_file.filename):
-        safe_name = secure_filename(image_file.filename)
-        image_filename = safe_name
-        image_path = os.path.join(UPLOAD_FOLDER, safe_name)
-        image_file.save(image_path)
+        image_filename = save_image(image_file.stream)
+        if image_filename is None:
+            flash(
+                "Pet photo was not a PNG, JPEG or GIF image and was skipped.",
+                "warning",
+            )
 
     pet = Pet(
         name=name,
@@ -226,11 +459,29 @@ def add_pet():
     )
     db.session.add(pet)
     db.session.commit()
+    invalidate_listings()
 
     flash("Pet added successfully", "success")
     return redirect(url_for("dashboard"))
 
 
+@app.route("/pets/<int:pet_id>/image", methods=["PUT"])
+@login_required
+def upload_pet_image(pet_id):
+    # Raw request body upload: skips multipart parsing and streams straight
+    # to disk, e.g. curl -T photo.jpg ...
+    require_own_pet(pet_id)
+
+    image_filename = save_image(request.stream)
+    if image_filename is None:
+        abort(415)
+
+    Pet.query.filter_by(id=pet_id).update({"image": image_filename})
+    db.session.commit()
+    invalidate_listings()
+    return "", 204
+
+
 @app.route("/adopt/<int:pet_id>", methods=["POST"])
 @login_required
 def adopt_pet(pet_id):
@@ -242,7 +493,8 @@ def adopt_pet(pet_id):
         status="pending",
     )
     db.session.add(req)
-    db.session.commit()
+    commit_or_404()
+    invalidate_listings()
     flash("Adoption request submitted", "success")
     return redirect(url_for("pets"))
 
@@ -252,13 +504,17 @@ def adopt_pet(pet_id):
 def request_mating(pet_id):
     requester_pet_id = int(request.form["requester_pet_id"])
 
+    # You can only offer one of your own pets for mating
+    require_own_pet(requester_pet_id)
+
     req = MatingRequest(
         pet_id=pet_id,
         requester_pet_id=requester_pet_id,
         status="pending",
     )
     db.session.add(req)
-    db.session.commit()
+    commit_or_404()
+    invalidate_listings()
     flash("Mating request submitted", "success")
     return redirect(url_for("pets"))
 
@@ -267,12 +523,27 @@ def request_mating(pet_id):
 @login_required
 def appointments():
     if current_user.role == "vet":
-        appts = VetAppointment.query.filter_by(vet_id=current_user.id).all()
-        users = []
+        appts = VetAppointment.query.filter_by(vet_id=current_user.id)
+        vets = []
     else:
-        appts = VetAppointment.query.filter_by(owner_id=current_user.id).all()
-        users = User.query.all()
-    return render_template("vet_appointments.html", appointments=appts, users=users)
+        appts = VetAppointment.query.filter_by(owner_id=current_user.id)
+        # Only what the vet dropdown shows, as plain rows rather than Users
+        vets = (
+            db.session.query(User.id, User.name, User.email)
+            .filter_by(role="vet")
+            .all()
+        )
+    appts_page = paginate(
+        appts.options(undefer(VetAppointment.reason)).order_by(
+            VetAppointment.appointment_time
+        )
+    )
+    return render_template(
+        "vet_appointments.html",
+        appointments=appts_page.items,
+        pagination=appts_page,
+        vets=vets,
+    )
 
 
 @app.route("/appointments/book", methods=["POST"])
@@ -283,7 +554,11 @@ def book_appointment():
     time_str = request.form["appointment_time"]
     reason = request.form.get("reason", "")
 
-    dt = datetime.strptime(time_str, "%Y-%m-%d %H:%M")
+    # datetime-local inputs submit ISO 8601, e.g. "2025-11-21T15:30"
+    dt = datetime.fromisoformat(time_str)
+
+    # Appointments can only be booked for your own pets
+    require_own_pet(pet_id)
 
     appt = VetAppointment(
         owner_id=current_user.id,
@@ -293,24 +568,55 @@ def book_appointment():
         reason=reason,
     )
     db.session.add(appt)
-    db.session.commit()
+    commit_or_404()
+    invalidate_listings()
     flash("Appointment booked", "success")
     return redirect(url_for("appointments"))
 
 
 @app.route("/admin")
 @login_required
+@cache_listing
 def admin_dashboard():
     # Only admins allowed
     if current_user.role != "admin":
         flash("Admin access only.", "danger")
         return redirect(url_for("dashboard"))
 
-    users = User.query.all()
-    pets = Pet.query.all()
-    adoptions = AdoptionRequest.query.all()
-    matings = MatingRequest.query.all()
-    appointments = VetAppointment.query.all()
+    strict = strict_loading()
+
+    # Each table is paginated independently (?users_page=, ?pets_page=, ...)
+    users = paginate(User.query.order_by(User.id), "users_page")
+    pets = paginate(
+        Pet.query.options(selectinload(Pet.owner), *strict).order_by(Pet.id),
+        "pets_page",
+    )
+    adoptions = paginate(
+        AdoptionRequest.query.options(
+            selectinload(AdoptionRequest.pet),
+            selectinload(AdoptionRequest.requester),
+            *strict,
+        ).order_by(AdoptionRequest.id),
+        "adoptions_page",
+    )
+    matings = paginate(
+        MatingRequest.query.options(
+            selectinload(MatingRequest.pet),
+            selectinload(MatingRequest.requester_pet),
+            *strict,
+        ).order_by(MatingRequest.id),
+        "matings_page",
+    )
+    appointments = paginate(
+        VetAppointment.query.options(
+            selectinload(VetAppointment.owner),
+            selectinload(VetAppointment.vet),
+            selectinload(VetAppointment.pet),
+            undefer(VetAppointment.reason),
+            *strict,
+        ).order_by(VetAppointment.id),
+        "appointments_page",
+    )
 
     return render_template(
         "admin_dashboard.html",
@@ -336,5 +642,6 @@ def init_db():
 if __name__ == "__main__":
     with app.app_context():
         db.create_all()
+        create_missing_indexes()
         create_admin_and_vet()
     app.run(debug=True)
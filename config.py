@@ -6,3 +6,27 @@ class Config:
     SECRET_KEY = "change-this-secret-key"
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "janvar.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_pre_ping": True,
+        "pool_size": 10,
+        # Pooled SQLite connections are handed to whichever thread needs one
+        "connect_args": {"check_same_thread": False},
+    }
+
+    # Listing page cache: Redis when REDIS_URL is set, otherwise files under
+    # the instance folder. Either is shared by all worker processes, so
+    # invalidating after a write reaches every worker
+    REDIS_URL = os.environ.get("REDIS_URL")
+    CACHE_TYPE = "RedisCache" if REDIS_URL else "FileSystemCache"
+    CACHE_REDIS_URL = REDIS_URL
+    CACHE_KEY_PREFIX = "janvar:"
+    CACHE_DEFAULT_TIMEOUT = 60
+
+    # Rows per page on the pet, appointment and admin listings
+    ITEMS_PER_PAGE = 50
+
+    # Reject request bodies (e.g. pet photo uploads) larger than 16 MiB
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+
+    # bcrypt cost factor (2^rounds iterations); raise it as hardware gets faster
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", 10))
@@ -0,0 +1,17 @@
+import multiprocessing
+import os
+
+# gunicorn app:app  -- picks this file up automatically
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Threaded workers: bcrypt releases the GIL while hashing, so a login or
+# registration only ties up its own thread instead of the whole worker
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Several worker processes are only safe with a cache backend they all share
+# (the default FileSystemCache, or RedisCache when REDIS_URL is set): writes
+# invalidate cached listings, and a per-process cache would only be cleared
+# in the worker that handled the write
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
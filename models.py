@@ -1,8 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import deferred
 from datetime import datetime
 
-db = SQLAlchemy()
+# Views read far more than they write and never query their own pending
+# changes, so skip autoflush before each query and keep loaded attributes
+# valid after commit instead of reloading them on next access
+db = SQLAlchemy(session_options={"autoflush": False, "expire_on_commit": False})
 
 # ---------- USER ----------
 class User(UserMixin, db.Model):
@@ -12,11 +16,11 @@ class User(UserMixin, db.Model):
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.String(20), default="owner")  # owner / vet / admin
+    role = db.Column(db.String(20), default="owner", index=True)  # owner / vet / admin
 
     city = db.Column(db.String(120))  # optional: for location-based matching
 
-    pets = db.relationship("Pet", backref="owner", lazy=True)
+    pets = db.relationship("Pet", back_populates="owner", lazy=True)
 
 
 # ---------- PET ----------
@@ -37,8 +41,8 @@ class Pet(db.Model):
 
     city = db.Column(db.String(120))  # city of the pet
 
-    is_for_adoption = db.Column(db.Boolean, default=False)
-    is_for_mating = db.Column(db.Boolean, default=False)
+    is_for_adoption = db.Column(db.Boolean, default=False, index=True)
+    is_for_mating = db.Column(db.Boolean, default=False, index=True)
 
     vaccinated = db.Column(db.Boolean, default=False)
     dewormed = db.Column(db.Boolean, default=False)
@@ -46,9 +50,13 @@ class Pet(db.Model):
     neutered = db.Column(db.Boolean, default=False)
 
     temperament = db.Column(db.String(120))  # calm / playful / friendly / etc.
-    health_notes = db.Column(db.Text)
+    health_notes = deferred(db.Column(db.Text))  # not shown in listings
 
-    owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    owner_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
+
+    owner = db.relationship("User", back_populates="pets", lazy=True)
 
 
 # ---------- ADOPTION REQUEST ----------
@@ -56,9 +64,11 @@ class AdoptionRequest(db.Model):
     __tablename__ = "adoption_requests"
 
     id = db.Column(db.Integer, primary_key=True)
-    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False)
-    requester_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    message = db.Column(db.Text)
+    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False, index=True)
+    requester_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False, index=True
+    )
+    message = deferred(db.Column(db.Text))
     status = db.Column(db.String(20), default="pending")  # pending / approved / rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -71,7 +81,7 @@ class MatingRequest(db.Model):
     __tablename__ = "mating_requests"
 
     id = db.Column(db.Integer, primary_key=True)
-    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False)
+    pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False, index=True)
     requester_pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False)
     status = db.Column(db.String(20), default="pending")  # pending / accepted / rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -83,13 +93,15 @@ class MatingRequest(db.Model):
 # ---------- VET APPOINTMENT ----------
 class VetAppointment(db.Model):
     __tablename__ = "vet_appointments"
+    # Also serves plain owner_id lookups, being the leading column
+    __table_args__ = (db.Index("ix_appt_owner_time", "owner_id", "appointment_time"),)
 
     id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     pet_id = db.Column(db.Integer, db.ForeignKey("pets.id"), nullable=False)
-    vet_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    appointment_time = db.Column(db.DateTime, nullable=False)
-    reason = db.Column(db.Text)
+    vet_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    appointment_time = db.Column(db.DateTime, nullable=False, index=True)
+    reason = deferred(db.Column(db.Text))  # undefer() where it's displayed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     owner = db.relationship("User", foreign_keys=[owner_id])